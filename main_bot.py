@@ -1,10 +1,21 @@
 import asyncio
+import atexit
+import bisect
+import heapq
 import logging
+import math
+import queue
+import re
 import sqlite3
+import threading
 import sys
+import time
 import traceback
-from datetime import datetime
-from typing import Dict, List, Optional
+from array import array
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 import requests
 import json
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot, ChatMember
@@ -19,25 +30,655 @@ import os
 BOT_TOKEN = ""
 ADMIN_USER_ID = 7139916921
 DB_NAME = "news_bot.db"
+# ملف تسجيل استجابات API الخام لإعادة تشغيلها لاحقاً (اتركه فارغاً للتعطيل)
+NEWS_RECORD_FILE = ""
+# هدف زمن التوصيل (SLO): نسبة الرسائل التي يجب أن تصل خلال المدة المحددة
+LATENCY_SLO_SECONDS = 120
+LATENCY_SLO_TARGET = 0.95
+# إعدادات البث اليدوي من المشرف
+SEND_RATE_LIMIT = 25  # الحد الأقصى لرسائل البوت في الثانية (مشترك بين النشر والبث)
+BROADCAST_CHUNK_SIZE = 200  # عدد القنوات المقروءة من قاعدة البيانات في كل دفعة
+BROADCAST_STATUS_INTERVAL = 5  # الفاصل بين تحديثات رسالة الحالة بالثواني
+# مراقبة توقف حلقة الأحداث والتحليل بالعينات
+STALL_THRESHOLD_MS = 500  # اعتبار الحلقة متوقفة إذا لم تتقدم خلال هذه المدة
+WATCHDOG_TICK_INTERVAL = 0.1
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 120
+# خط معالجة الأخبار (جلب ← إزالة التكرار ← تنسيق ← إرسال)
+NEWS_POLL_INTERVAL = 60  # الفاصل بين طلبات API بالثواني
+NEWS_STALE_SECONDS = 1800  # الأخبار التي بقيت في خط المعالجة أطول من ذلك منذ جلبها لا تُرسل
+RAW_QUEUE_SIZE = 10
+NEWS_QUEUE_SIZE = 100
+DELIVERY_QUEUE_SIZE = 5
 
-# إعداد التسجيل المحسن
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('bot.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+# إعدادات السجل
+LOG_FILE = "bot.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # تدوير الملف عند تجاوز 10 ميجابايت
+LOG_ROTATE_SECONDS = 24 * 3600  # وتدويره أيضاً كل يوم
+LOG_BACKUP_COUNT = 7
+LOG_JSON = False  # كتابة ملف السجل بصيغة JSON (سطر لكل رسالة)
+LOG_QUEUE_SIZE = 10000
+LOG_SAMPLE_WINDOW = 60  # نافذة تجميع الرسائل المتكررة بالثواني
+LOG_SAMPLE_BURST = 5  # عدد الرسائل المتطابقة المسموح بها في كل نافذة
+
+class RotatingLogFileHandler(RotatingFileHandler):
+    """تدوير ملف السجل عند تجاوز الحجم المحدد أو مرور المدة المحددة"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, interval: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        self.interval = interval
+        # الاعتماد على آخر تعديل للملف حتى لا يُؤجَّل التدوير بعد كل إعادة تشغيل
+        start = os.path.getmtime(filename) if os.path.exists(filename) else time.time()
+        self.rollover_at = start + interval
+
+    def shouldRollover(self, record) -> bool:
+        if self.interval and time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.interval
+
+class JsonLogFormatter(logging.Formatter):
+    """تنسيق السجل كسطر JSON واحد لكل رسالة"""
+
+    def format(self, record) -> str:
+        return json.dumps({
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }, ensure_ascii=False)
+
+class SamplingQueueHandler(QueueHandler):
+    """وضع السجلات في طابور غير حاجب مع تجاهل الرسائل المتطابقة المتكررة"""
+
+    DIGITS = re.compile(r'-?\d+')
+
+    def __init__(self, log_queue: queue.Queue, window: float, burst: int, max_keys: int = 1000):
+        super().__init__(log_queue)
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self.counts: Dict[Tuple[str, int, str], int] = {}
+        self.window_start = time.monotonic()
+        self.dropped = 0
+        self.sample_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        # خيط يُنهي كل نافذة في موعدها حتى لا يتأخر ملخص الرسائل المتجاهلة حتى وصول رسالة جديدة
+        self.flusher = threading.Thread(target=self._flush_periodically, name="log-sampler", daemon=True)
+        self.flusher.start()
+
+    def _flush_window(self) -> List[logging.LogRecord]:
+        """إنهاء النافذة الحالية وإنشاء ملخص لكل رسالة تم تجاهلها (يُستدعى مع sample_lock)"""
+        elapsed = time.monotonic() - self.window_start
+        summaries = []
+        for (name, level, message), count in self.counts.items():
+            if count > self.burst:
+                summaries.append(logging.LogRecord(
+                    name, level, "", 0,
+                    f"🔁 تم تجاهل {count - self.burst} رسالة مماثلة خلال آخر {elapsed:.0f} ثانية: {message[:200]}",
+                    None, None
+                ))
+        if self.dropped:
+            summaries.append(logging.LogRecord(
+                __name__, logging.WARNING, "", 0, f"⚠️ تم إسقاط {self.dropped} رسالة لامتلاء طابور السجل", None, None
+            ))
+            self.dropped = 0
+        self.counts = {}
+        self.window_start = time.monotonic()
+        return summaries
+
+    def flush_summaries(self):
+        """إنهاء النافذة الحالية فوراً ووضع ملخصاتها في الطابور"""
+        with self.sample_lock:
+            summaries = self._flush_window()
+        for summary in summaries:
+            super().emit(summary)
+
+    def _flush_periodically(self):
+        while True:
+            with self.sample_lock:
+                remaining = self.window - (time.monotonic() - self.window_start)
+            if remaining > 0:
+                if self.stop_event.wait(remaining):
+                    return
+                continue
+            self.flush_summaries()
+
+    def close(self):
+        self.stop_event.set()
+        super().close()
+
+    def emit(self, record):
+        try:
+            with self.sample_lock:
+                summaries = []
+                if time.monotonic() - self.window_start >= self.window or len(self.counts) >= self.max_keys:
+                    summaries = self._flush_window()
+                # توحيد الأرقام (مثل معرفات القنوات) حتى تُعامل أخطاء القنوات المختلفة كرسالة واحدة
+                key = (record.name, record.levelno, self.DIGITS.sub('#', record.getMessage()))
+                count = self.counts.get(key, 0) + 1
+                self.counts[key] = count
+
+            for summary in summaries:
+                super().emit(summary)
+            if count <= self.burst:
+                super().emit(record)
+        except Exception:
+            self.handleError(record)
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.sample_lock:
+                self.dropped += 1
+
+def setup_logging() -> QueueListener:
+    """إعداد السجل: الكتابة للملف والشاشة تتم في خيط منفصل عبر طابور"""
+    text_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    file_handler = RotatingLogFileHandler(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_ROTATE_SECONDS)
+    file_handler.setFormatter(JsonLogFormatter() if LOG_JSON else text_formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(text_formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    listener.start()
+
+    sampling_handler = SamplingQueueHandler(log_queue, LOG_SAMPLE_WINDOW, LOG_SAMPLE_BURST)
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(sampling_handler)
+
+    def shutdown_logging():
+        # كتابة ملخصات النافذة الأخيرة قبل إيقاف خيط الكتابة
+        sampling_handler.flush_summaries()
+        listener.stop()
+    atexit.register(shutdown_logging)
+    return listener
+
+log_listener = setup_logging()
 logger = logging.getLogger(__name__)
 
+@dataclass
+class NewsItem:
+    """خبر واحد مع توقيتاته عبر مراحل المعالجة"""
+    text: str
+    created_at: Optional[float]  # توقيت نشره في المصدر (epoch)
+    fetched_at: float  # توقيت جلبه من API
+
+    @property
+    def origin_time(self) -> float:
+        return self.created_at if self.created_at is not None else self.fetched_at
+
+
+def parse_created_at(value) -> Optional[float]:
+    """تحويل قيمة createdAt (ISO أو epoch بالثواني/المللي ثانية) إلى epoch (UTC افتراضياً)"""
+    try:
+        if value is None or value == "":
+            return None
+        if isinstance(value, (int, float)) or str(value).isdigit():
+            value = float(value)
+            return value / 1000 if value > 1e12 else value
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)  # القيم بدون منطقة زمنية تُعامل كتوقيت UTC
+        return parsed.timestamp()
+    except (ValueError, OverflowError):
+        return None
+
+
+def channel_class(chat_type: Optional[str]) -> str:
+    """تصنيف الدردشة لأغراض الإحصاءات: قناة أو مجموعة"""
+    return "channel" if chat_type == ChatType.CHANNEL else "group"
+
+
+class ChannelSnapshot:
+    """لقطة من القنوات النشطة يمكن المرور عليها دون نسخ"""
+
+    __slots__ = ('registry', 'chat_ids', 'types', 'rate_classes', 'count')
+
+    def __init__(self, registry: "ChannelRegistry", chat_ids: array, types: array, rate_classes: array, count: int):
+        self.registry = registry
+        self.chat_ids = chat_ids
+        self.types = types
+        self.rate_classes = rate_classes
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        """(chat_id، نوع الدردشة، فئة المعدل) لكل قناة ما تزال نشطة لحظة الوصول إليها"""
+        type_names = ChannelRegistry.TYPE_NAMES
+        rate_names = ChannelRegistry.RATE_CLASSES
+        for chat_id, type_code, rate_code in zip(self.chat_ids, self.types, self.rate_classes):
+            # الفحص في السجل الحالي لا في مصفوفات اللقطة، لأن الإضافة والضغط
+            # ينشئان مصفوفات جديدة لا تصل إليها علامات الحذف اللاحقة
+            if chat_id in self.registry:
+                yield chat_id, type_names[type_code], rate_names[rate_code]
+
+
+class ChannelRegistry:
+    """سجل القنوات النشطة في الذاكرة بمصفوفات مرتبة حسب chat_id
+
+    إلغاء التفعيل يضع علامة حذف في مكانها (O(log n)) دون نسخ، وتُضغط المصفوفات عند
+    أخذ لقطة جديدة إذا كثرت علامات الحذف. إضافة قناة جديدة والضغط ينشئان مصفوفات
+    جديدة فلا تتغير اللقطات التي يجري المرور عليها؛ وتتخطى اللقطة القنوات الملغاة
+    لاحقاً لأنها تفحص كل قناة في السجل الحالي عند الوصول إليها.
+    """
+
+    TYPE_NAMES = (None, ChatType.CHANNEL, ChatType.GROUP, ChatType.SUPERGROUP, ChatType.PRIVATE, ChatType.SENDER)
+    RATE_CLASSES = ("channel", "group")
+    COMPACT_RATIO = 0.25  # نسبة علامات الحذف التي تستدعي الضغط
+
+    def __init__(self):
+        self.chat_ids = array('q')
+        self.types = array('b')
+        self.rate_classes = array('b')
+        self.active = bytearray()
+        self.tombstones = 0
+        self.loaded = False
+
+    def _codes(self, chat_type: Optional[str]) -> Tuple[int, int]:
+        # الأنواع غير المعروفة تُخزن كـ None وتُعامل كمجموعة (الفئة الأكثر تقييداً)
+        type_code = self.TYPE_NAMES.index(chat_type) if chat_type in self.TYPE_NAMES else 0
+        return type_code, self.RATE_CLASSES.index(channel_class(self.TYPE_NAMES[type_code]))
+
+    def _find(self, chat_id: int) -> int:
+        i = bisect.bisect_left(self.chat_ids, chat_id)
+        return i if i < len(self.chat_ids) and self.chat_ids[i] == chat_id else -1
+
+    def load(self, rows: List[Tuple[int, str]]):
+        """تحميل القنوات النشطة دفعة واحدة من قاعدة البيانات"""
+        rows = sorted(rows)
+        codes = [self._codes(chat_type) for _, chat_type in rows]
+        self.chat_ids = array('q', (chat_id for chat_id, _ in rows))
+        self.types = array('b', (type_code for type_code, _ in codes))
+        self.rate_classes = array('b', (rate_code for _, rate_code in codes))
+        self.active = bytearray(b'\x01') * len(rows)
+        self.tombstones = 0
+        self.loaded = True
+
+    def add(self, chat_id: int, chat_type: Optional[str]):
+        type_code, rate_code = self._codes(chat_type)
+        i = self._find(chat_id)
+        if i >= 0:
+            self.types[i], self.rate_classes[i] = type_code, rate_code
+            if not self.active[i]:
+                self.active[i] = 1
+                self.tombstones -= 1
+            return
+        i = bisect.bisect_left(self.chat_ids, chat_id)
+        self.chat_ids = self.chat_ids[:i] + array('q', [chat_id]) + self.chat_ids[i:]
+        self.types = self.types[:i] + array('b', [type_code]) + self.types[i:]
+        self.rate_classes = self.rate_classes[:i] + array('b', [rate_code]) + self.rate_classes[i:]
+        self.active = self.active[:i] + b'\x01' + self.active[i:]
+
+    def remove(self, chat_id: int):
+        i = self._find(chat_id)
+        if i >= 0 and self.active[i]:
+            self.active[i] = 0
+            self.tombstones += 1
+
+    def compact(self):
+        """حذف القنوات المعلَّمة فعلياً (ينشئ مصفوفات جديدة)"""
+        keep = [i for i, is_active in enumerate(self.active) if is_active]
+        self.chat_ids = array('q', (self.chat_ids[i] for i in keep))
+        self.types = array('b', (self.types[i] for i in keep))
+        self.rate_classes = array('b', (self.rate_classes[i] for i in keep))
+        self.active = bytearray(b'\x01') * len(keep)
+        self.tombstones = 0
+
+    def __contains__(self, chat_id: int) -> bool:
+        i = self._find(chat_id)
+        return i >= 0 and bool(self.active[i])
+
+    def __len__(self) -> int:
+        return len(self.chat_ids) - self.tombstones
+
+    def snapshot(self) -> ChannelSnapshot:
+        if self.tombstones > len(self.chat_ids) * self.COMPACT_RATIO:
+            self.compact()
+        return ChannelSnapshot(self, self.chat_ids, self.types, self.rate_classes, len(self))
+
+
+class LatencySketch:
+    """تقدير النسب المئوية بذاكرة محدودة عبر سلال لوغاريتمية بدقة نسبية ثابتة"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 512, min_value: float = 0.001):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.min_value = min_value
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1):
+        self.count += count
+        if value <= self.min_value:
+            self.zero_count += count
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + count
+        if len(self.bins) > self.max_bins:
+            # دمج أصغر سلتين للحفاظ على حد الذاكرة (تفقد الدقة في القيم الصغيرة فقط)
+            lowest, second = sorted(self.bins)[:2]
+            self.bins[second] += self.bins.pop(lowest)
+
+    def merge(self, other: "LatencySketch"):
+        self.zero_count += other.zero_count
+        self.count += other.zero_count
+        for key, count in other.bins.items():
+            self.add(self._bin_value(key), count)
+
+    def _bin_value(self, key: int) -> float:
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._bin_value(key)
+        return self._bin_value(max(self.bins))
+
+    def fraction_below(self, value: float) -> Optional[float]:
+        if not self.count:
+            return None
+        below = self.zero_count + sum(c for k, c in self.bins.items() if self._bin_value(k) <= value)
+        return below / self.count
+
+
+class LatencyTracker:
+    """تجميع أزمنة التوصيل لكل ساعة ولكل فئة دردشة مع الاحتفاظ بأبطأ الحالات"""
+
+    def __init__(self, retention_hours: int = 24, tail_size: int = 10):
+        self.retention_hours = retention_hours
+        self.tail_size = tail_size
+        self.delivery: Dict[Tuple[str, str], LatencySketch] = {}  # (الساعة، الفئة) -> المخطط
+        self.fetch_lag: Dict[str, LatencySketch] = {}  # الساعة -> المخطط
+        self.slowest: List[Tuple[float, float, int]] = []  # (زمن التوصيل، توقيت التسليم، chat_id)
+
+    @staticmethod
+    def hour_key(timestamp: float) -> str:
+        return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:00')
+
+    def record_fetch(self, item: NewsItem):
+        """تسجيل الفارق بين النشر في المصدر والجلب"""
+        if item.created_at is None:
+            return
+        key = self.hour_key(item.fetched_at)
+        self.fetch_lag.setdefault(key, LatencySketch()).add(item.fetched_at - item.created_at)
+        self._prune()
+
+    def record_delivery(self, item: NewsItem, chat_id: int, chat_class: str, delivered_at: float):
+        """تسجيل اكتمال إرسال الخبر لقناة واحدة"""
+        latency = max(0.0, delivered_at - item.origin_time)  # تجاهل انحراف ساعة المصدر
+        key = (self.hour_key(delivered_at), chat_class)
+        self.delivery.setdefault(key, LatencySketch()).add(latency)
+
+        entry = (latency, delivered_at, chat_id)
+        if len(self.slowest) < self.tail_size:
+            heapq.heappush(self.slowest, entry)
+        elif latency > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def _prune(self):
+        cutoff = self.hour_key(time.time() - self.retention_hours * 3600)
+        for key in [k for k in self.delivery if k[0] < cutoff]:
+            del self.delivery[key]
+        for key in [k for k in self.fetch_lag if k < cutoff]:
+            del self.fetch_lag[key]
+        self.slowest = [e for e in self.slowest if self.hour_key(e[1]) >= cutoff]
+        heapq.heapify(self.slowest)
+
+    def combined(self, chat_class: Optional[str] = None) -> LatencySketch:
+        """دمج مخططات آخر 24 ساعة (لفئة معينة أو للجميع)"""
+        self._prune()
+        sketch = LatencySketch()
+        for (_, cls), part in self.delivery.items():
+            if chat_class is None or cls == chat_class:
+                sketch.merge(part)
+        return sketch
+
+    def hourly(self) -> List[Tuple[str, LatencySketch]]:
+        """مخطط مدمج لكل ساعة مرتب زمنياً"""
+        self._prune()
+        hours: Dict[str, LatencySketch] = {}
+        for (hour, _), part in self.delivery.items():
+            hours.setdefault(hour, LatencySketch()).merge(part)
+        return sorted(hours.items())
+
+    def combined_fetch_lag(self) -> LatencySketch:
+        self._prune()
+        sketch = LatencySketch()
+        for part in self.fetch_lag.values():
+            sketch.merge(part)
+        return sketch
+
+
+def frame_labels(frame) -> List[str]:
+    """أسماء إطارات المكدس من الأبعد إلى الأقرب بصيغة ملف:دالة"""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class LoopWatchdog:
+    """خيط مراقبة يكشف توقف حلقة asyncio ويلتقط مكدس خيطها لحظة التوقف"""
+
+    def __init__(self, threshold_ms: float = STALL_THRESHOLD_MS, tick_interval: float = WATCHDOG_TICK_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.tick_interval = tick_interval
+        self.last_tick = time.monotonic()
+        self.loop_thread_id = None
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.heartbeat_task = None
+        # موضع الاستدعاء -> [عدد مرات التوقف، المدة الكلية، أطول مدة، مثال للمكدس]
+        self.stalls: Dict[str, list] = {}
+        self.stalls_lock = threading.Lock()
+
+    def start(self):
+        """يُستدعى من داخل حلقة الأحداث"""
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.stop_event.clear()
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+        self.thread = threading.Thread(target=self.watch, name="loop-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.heartbeat_task and not self.heartbeat_task.done():
+            self.heartbeat_task.cancel()
+
+    async def heartbeat(self):
+        while True:
+            self.last_tick = time.monotonic()
+            await asyncio.sleep(self.tick_interval)
+
+    def call_site(self, stack: List[str]) -> str:
+        """أقرب إطار من كود البوت نفسه (وإلا فأقرب إطار على الإطلاق)"""
+        own_file = os.path.basename(__file__)
+        for label in reversed(stack):
+            if label.startswith(own_file + ":"):
+                return label
+        return stack[-1] if stack else "?"
+
+    def watch(self):
+        stall_site = None
+        while not self.stop_event.wait(self.tick_interval):
+            last_tick = self.last_tick
+            if stall_site is None:
+                if time.monotonic() - last_tick - self.tick_interval > self.threshold:
+                    frame = sys._current_frames().get(self.loop_thread_id)
+                    stall_stack = frame_labels(frame) if frame else []
+                    stall_site = self.call_site(stall_stack)
+                    stall_tick = last_tick
+                    logger.warning(f"⚠️ توقف حلقة الأحداث أكثر من {self.threshold * 1000:.0f}ms عند {stall_site}")
+            elif last_tick != stall_tick:
+                # عادت الحلقة للعمل: مدة التوقف هي الفارق بين النبضتين
+                self.record_stall(stall_site, stall_stack, last_tick - stall_tick - self.tick_interval)
+                stall_site = None
+
+    def record_stall(self, site: str, stack: List[str], duration: float):
+        with self.stalls_lock:
+            entry = self.stalls.setdefault(site, [0, 0.0, 0.0, stack])
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+                entry[3] = stack
+
+    def top_stalls(self, limit: int = 10) -> List[Tuple[str, int, float, float, List[str]]]:
+        with self.stalls_lock:
+            items = [(site, *entry) for site, entry in self.stalls.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)[:limit]
+
+
+def sample_profile(seconds: float, interval: float = PROFILE_SAMPLE_INTERVAL) -> str:
+    """تحليل بالعينات لجميع الخيوط وإرجاع المكدسات المطوية (صيغة flamegraph.pl)"""
+    own_thread = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    counts: Dict[str, int] = {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            stack = ";".join([names.get(thread_id, str(thread_id))] + frame_labels(frame))
+            counts[stack] = counts.get(stack, 0) + 1
+        time.sleep(interval)
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items()))
+
+
+@dataclass
+class RenderedNews:
+    """رسالة جاهزة للإرسال تضم خبراً واحداً أو أكثر"""
+    items: List[NewsItem]
+    text: str
+
+
+class StageQueue:
+    """طابور محدود بين مرحلتين مع سياسة عند الامتلاء وإحصاءات العمق وزمن الانتظار
+
+    سياسات الامتلاء:
+    - block: ينتظر المُرسِل حتى يتوفر مكان (ضغط عكسي)
+    - drop_oldest: يُسقط أقدم عنصر في الطابور
+    - coalesce: يدمج كل عنصرين متجاورين عبر merge ما دام الدمج ممكناً، فإن بقي
+      الطابور ممتلئاً يعود للضغط العكسي بدلاً من إسقاط أي عنصر
+
+    الإحصاءات (دخل/أُسقط/دُمج) تُحسب بعدد الأخبار عبر count لا بعدد عناصر الطابور.
+    """
+
+    def __init__(self, name: str, maxsize: int, overflow: str = 'block', merge=None, count=None):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflow = overflow
+        self.merge = merge
+        self.count = count or (lambda item: 1)
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.wait = LatencySketch()
+        self.service = LatencySketch()
+        self.service_start = None
+
+    def _drop_oldest(self):
+        _, item = self.queue.get_nowait()
+        self.queue.task_done()
+        self.dropped += self.count(item)
+
+    async def _coalesce_put(self, item):
+        entries = [self.queue.get_nowait() for _ in range(self.queue.qsize())]
+        for _ in entries:
+            self.queue.task_done()
+        entries.append((time.monotonic(), item))
+
+        # دمج المتجاورين دون تقسيم أي عنصر مدمج سابقاً، مع الاحتفاظ بزمن أقدمها لقياس الانتظار
+        groups = []
+        for enqueued_at, entry in entries:
+            merged = self.merge(groups[-1][1], entry) if groups else None
+            if merged is not None:
+                groups[-1] = (groups[-1][0], merged)
+            else:
+                groups.append((enqueued_at, entry))
+
+        # كل خبر يُحسب مرة واحدة: عند انتقاله من رسالة منفردة إلى رسالة مدمجة
+        singles_before = sum(1 for _, entry in entries if self.count(entry) == 1)
+        singles_after = sum(1 for _, entry in groups if self.count(entry) == 1)
+        self.coalesced += singles_before - singles_after
+
+        for group in groups:
+            await self.queue.put(group)  # ينتظر (ضغط عكسي) إن لم يكفِ الدمج
+
+    async def put(self, item):
+        if self.overflow == 'block':
+            await self.queue.put((time.monotonic(), item))
+        elif self.queue.full() and self.overflow == 'coalesce' and self.merge:
+            await self._coalesce_put(item)
+        else:
+            while self.queue.full():
+                self._drop_oldest()
+            self.queue.put_nowait((time.monotonic(), item))
+        self.enqueued += self.count(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    async def get(self):
+        enqueued_at, item = await self.queue.get()
+        self.service_start = time.monotonic()
+        self.wait.add(self.service_start - enqueued_at)
+        return item
+
+    def task_done(self):
+        if self.service_start is not None:
+            self.service.add(time.monotonic() - self.service_start)
+            self.service_start = None
+        self.queue.task_done()
+
+    async def join(self):
+        await self.queue.join()
+
+
+def format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.1f}s" if value < 120 else f"{value / 60:.1f}m"
+
+
 class RobustNewsBot:
     def __init__(self):
         self.application = None
         self.bot = None
         self.published_news = set()
         self.is_running = False
-        self.news_task = None
+        self.time_scale = 1.0  # معامل تسريع الوقت (يُستخدم عند إعادة تشغيل التسجيلات)
+        self.latency = LatencyTracker()
+        self.broadcast_tasks: Dict[int, asyncio.Task] = {}
+        self.broadcast_state: Dict[int, str] = {}  # الحالة المطلوبة لكل مهمة بث قيد التشغيل
+        self.watchdog = LoopWatchdog()
+        self.stage_tasks: List[asyncio.Task] = []
+        self.stale_news = 0
+        self.parse_errors = 0  # استجابات API التالفة التي فشل تحليلها
+        self.next_send_slot = 0.0  # موعد أقرب إرسال متاح حسب SEND_RATE_LIMIT
+        self.channel_registry = ChannelRegistry()
         
     def init_database(self):
         """إنشاء قاعدة البيانات والجداول مع حل مشكلات الأعمدة المفقودة"""
@@ -99,6 +740,24 @@ class RobustNewsBot:
                 )
             ''')
 
+            # جدول مهام البث (last_chat_id هو مؤشر الاستئناف)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    message_text TEXT,
+                    status TEXT DEFAULT 'running',
+                    last_chat_id INTEGER,
+                    total INTEGER DEFAULT 0,
+                    sent INTEGER DEFAULT 0,
+                    failed INTEGER DEFAULT 0,
+                    status_chat_id INTEGER,
+                    status_message_id INTEGER,
+                    created_by INTEGER,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TEXT
+                )
+            ''')
+
             conn.commit()
             logger.info("✅ تم إنشاء/تحديث قاعدة البيانات بنجاح")
         except Exception as e:
@@ -150,6 +809,18 @@ class RobustNewsBot:
         except Exception as e:
             logger.error(f"فشل في حفظ الخطأ في قاعدة البيانات: {e}")
     
+    async def sleep(self, seconds: float):
+        """انتظار مع مراعاة معامل تسريع الوقت"""
+        await asyncio.sleep(seconds / self.time_scale)
+
+    async def acquire_send_slot(self):
+        """حجز موعد إرسال من محدد المعدل المشترك (النشر وجميع مهام البث)"""
+        now = time.monotonic()
+        slot = max(now, self.next_send_slot)
+        self.next_send_slot = slot + 1 / (SEND_RATE_LIMIT * self.time_scale)
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
     async def safe_api_request(self, func, *args, **kwargs):
         """تنفيذ طلبات API بأمان مع إعادة المحاولة"""
         max_retries = 3
@@ -161,20 +832,20 @@ class RobustNewsBot:
             except NetworkError as e:
                 if attempt < max_retries - 1:
                     logger.warning(f"خطأ شبكة، إعادة المحاولة {attempt + 1}/{max_retries}: {e}")
-                    await asyncio.sleep(retry_delay * (attempt + 1))
+                    await self.sleep(retry_delay * (attempt + 1))
                 else:
                     raise e
             except TelegramError as e:
                 if "flood control" in str(e).lower():
                     wait_time = 30  # انتظار 30 ثانية في حالة flood control
                     logger.warning(f"Flood control detected, waiting {wait_time} seconds")
-                    await asyncio.sleep(wait_time)
+                    await self.sleep(wait_time)
                     if attempt < max_retries - 1:
                         continue
                 raise e
 
-    def get_news_from_api(self) -> List[str]:
-        """جلب الأخبار من API مع معالجة محسنة للأخطاء"""
+    def fetch_news_response(self) -> Optional[Tuple[int, str, float]]:
+        """جلب استجابة API الخام (يعمل في خيط منفصل حتى لا يوقف حلقة الأحداث)"""
         try:
             # نقطة النهاية الصحيحة لأخبار الجزيرة المباشر
             url = "https://www.aljazeeramubasher.net/graphql"
@@ -211,53 +882,63 @@ class RobustNewsBot:
                 timeout=30
             )
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                if "data" not in data or "tvBreakingNews" not in data["data"]:
-                    logger.warning("استجابة API غير صحيحة أو لا توجد أخبار حالياً")
-                    return []
-                
-                news_list = []
-                
-                for item in data["data"]["tvBreakingNews"]:
-                    if "text" not in item:
-                        continue
-                        
-                    news_text = item["text"].strip()
-                    if not news_text:
-                        continue
-                        
-                    news_hash = hashlib.md5(news_text.encode()).hexdigest()
-                    
-                    # فحص إذا كان الخبر جديد
-                    if news_hash not in self.published_news:
-                        news_list.append(news_text)
-                        self.published_news.add(news_hash)
-                        
-                        # حفظ في قاعدة البيانات
-                        self.save_published_news(news_hash, news_text)
-                
-                logger.info(f"تم جلب {len(news_list)} خبر جديد من API")
-                return news_list
-            else:
-                logger.error(f"فشل في جلب الأخبار - كود الاستجابة: {response.status_code}")
-                return []
+            self.record_api_response(response.status_code, response.text)
+            return response.status_code, response.text, time.time()
                 
         except requests.exceptions.Timeout:
             logger.error("انتهت مهلة انتظار طلب API")
-            return []
+            return None
         except requests.exceptions.ConnectionError:
             logger.error("خطأ في الاتصال بـ API")
-            return []
+            return None
+    
+    def record_api_response(self, status_code: int, body: str):
+        """إلحاق استجابة API الخام مع توقيتها بملف التسجيل"""
+        if not NEWS_RECORD_FILE:
+            return
+        try:
+            record = {"t": time.time(), "status": status_code, "body": body}
+            with open(NEWS_RECORD_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
         except Exception as e:
-            error_msg = f"خطأ في جلب الأخبار: {str(e)}"
-            logger.error(error_msg)
+            logger.error(f"خطأ في تسجيل استجابة API: {e}")
+
+    def parse_news_response(self, status_code: int, body: str, fetched_at: Optional[float] = None) -> List[NewsItem]:
+        """تحليل استجابة API واستخراج الأخبار الجديدة فقط"""
+        fetched_at = fetched_at or time.time()
+        if status_code == 200:
+            data = json.loads(body)
             
-            # إرسال الخطأ للمشرف
-            asyncio.create_task(
-                self.send_error_to_admin("API Error", error_msg, traceback.format_exc())
-            )
+            if "data" not in data or "tvBreakingNews" not in data["data"]:
+                logger.warning("استجابة API غير صحيحة أو لا توجد أخبار حالياً")
+                return []
+            
+            news_list = []
+            
+            for item in data["data"]["tvBreakingNews"]:
+                if "text" not in item:
+                    continue
+                    
+                news_text = item["text"].strip()
+                if not news_text:
+                    continue
+                    
+                news_hash = hashlib.md5(news_text.encode()).hexdigest()
+                
+                # فحص إذا كان الخبر جديد
+                if news_hash not in self.published_news:
+                    news_item = NewsItem(news_text, parse_created_at(item.get("createdAt")), fetched_at)
+                    self.latency.record_fetch(news_item)
+                    news_list.append(news_item)
+                    self.published_news.add(news_hash)
+                    
+                    # حفظ في قاعدة البيانات
+                    self.save_published_news(news_hash, news_text)
+            
+            logger.info(f"تم جلب {len(news_list)} خبر جديد من API")
+            return news_list
+        else:
+            logger.error(f"فشل في جلب الأخبار - كود الاستجابة: {status_code}")
             return []
     
     def save_published_news(self, news_hash: str, news_text: str):
@@ -287,18 +968,23 @@ class RobustNewsBot:
         except Exception as e:
             logger.error(f"خطأ في تحميل الأخبار المحفوظة: {e}")
     
-    def get_active_channels(self) -> List[int]:
-        """الحصول على قائمة القنوات والجروبات النشطة"""
+    def load_active_channels(self):
+        """تحميل القنوات والجروبات النشطة إلى السجل في الذاكرة"""
         try:
             conn = sqlite3.connect(DB_NAME)
             cursor = conn.cursor()
-            cursor.execute('SELECT chat_id FROM channels WHERE is_active = 1')
-            channels = [row[0] for row in cursor.fetchall()]
+            cursor.execute('SELECT chat_id, chat_type FROM channels WHERE is_active = 1')
+            self.channel_registry.load(cursor.fetchall())
             conn.close()
-            return channels
+            logger.info(f"تم تحميل {len(self.channel_registry)} قناة نشطة")
         except Exception as e:
             logger.error(f"خطأ في جلب القنوات النشطة: {e}")
-            return []
+
+    def get_active_channels(self) -> ChannelSnapshot:
+        """لقطة من القنوات والجروبات النشطة (chat_id، النوع، فئة المعدل)"""
+        if not self.channel_registry.loaded:
+            self.load_active_channels()
+        return self.channel_registry.snapshot()
     
     def add_channel(self, chat_id: int, chat_title: str, chat_type: str, added_by: Optional[int]):
         """إضافة قناة أو جروب جديد"""
@@ -312,65 +998,336 @@ class RobustNewsBot:
             ''', (chat_id, chat_title, chat_type, added_by, datetime.now().isoformat()))
             conn.commit()
             conn.close()
+            self.channel_registry.add(chat_id, chat_type)
             logger.info(f"تم إضافة القناة {chat_title} ({chat_id})")
             return True
         except Exception as e:
             logger.error(f"خطأ في إضافة القناة: {e}")
             return False
     
-    async def publish_news_to_channels(self, news_list: List[str]):
-        """نشر الأخبار في جميع القنوات والجروبات"""
-        if not news_list:
-            return
-        
+    def render_news(self, items: List[NewsItem]) -> str:
+        """تنسيق خبر واحد أو عدة أخبار في رسالة واحدة"""
+        if len(items) == 1:
+            return f"🚨 **خبر عاجل** 🚨\n\n{items[0].text}\n\n📺 الجزيرة مباشر"
+        body = "\n\n".join(f"• {item.text}" for item in items)
+        return f"🚨 **أخبار عاجلة** 🚨\n\n{body}\n\n📺 الجزيرة مباشر"
+
+    def merge_rendered_news(self, first: RenderedNews, second: RenderedNews) -> Optional[RenderedNews]:
+        """دمج رسالتين منتظرتين في رسالة واحدة إن لم تتجاوز حد تيليجرام"""
+        items = first.items + second.items
+        text = self.render_news(items)
+        return RenderedNews(items, text) if len(text) <= 4000 else None
+
+    async def deliver_news(self, rendered: RenderedNews):
+        """إرسال رسالة جاهزة لجميع القنوات والجروبات النشطة"""
         active_channels = self.get_active_channels()
         if not active_channels:
             logger.info("لا توجد قنوات نشطة لنشر الأخبار")
             return
         
-        logger.info(f"نشر {len(news_list)} خبر في {len(active_channels)} قناة")
+        logger.info(f"نشر {len(rendered.items)} خبر في {len(active_channels)} قناة")
         
-        for news_text in news_list:
-            # تنسيق الخبر
-            formatted_news = f"🚨 **خبر عاجل** 🚨\n\n{news_text}\n\n📺 الجزيرة مباشر"
-            
-            successful_sends = 0
-            failed_channels = []
-            
-            for chat_id in active_channels:
-                try:
-                    await self.safe_api_request(
-                        self.bot.send_message,
-                        chat_id=chat_id,
-                        text=formatted_news,
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                    successful_sends += 1
-                    await asyncio.sleep(1)  # تأخير بين الرسائل
-                    
-                except Exception as e:
-                    error_msg = str(e).lower()
-                    failed_channels.append(chat_id)
-                    
-                    # التحقق من أسباب الفشل الشائعة
-                    if any(keyword in error_msg for keyword in ['bot was kicked', 'chat not found', 'forbidden']):
-                        logger.warning(f"إزالة القناة {chat_id} - السبب: {e}")
-                        self.deactivate_channel(chat_id)
-                    elif 'flood control' in error_msg:
-                        logger.warning(f"Flood control للقناة {chat_id}")
-                        await asyncio.sleep(60)  # انتظار دقيقة
-                    else:
-                        logger.error(f"فشل في إرسال الخبر للقناة {chat_id}: {e}")
-            
-            if failed_channels:
-                await self.send_error_to_admin(
-                    "News Publishing Error",
-                    f"فشل نشر الخبر في {len(failed_channels)} قناة من أصل {len(active_channels)}",
-                    f"القنوات الفاشلة: {failed_channels}"
+        successful_sends = 0
+        failed_channels = []
+        
+        # اللقطة تتخطى القنوات التي أُلغي تفعيلها أثناء النشر
+        for chat_id, _, rate_class in active_channels:
+            await self.acquire_send_slot()
+            try:
+                await self.safe_api_request(
+                    self.bot.send_message,
+                    chat_id=chat_id,
+                    text=rendered.text,
+                    parse_mode=ParseMode.MARKDOWN
                 )
-            
-            logger.info(f"تم نشر الخبر بنجاح في {successful_sends}/{len(active_channels)} قناة")
+                delivered_at = time.time()
+                for item in rendered.items:
+                    self.latency.record_delivery(item, chat_id, rate_class, delivered_at)
+                successful_sends += 1
+                await self.sleep(1)  # تأخير بين الرسائل
+                
+            except Exception as e:
+                error_msg = str(e).lower()
+                failed_channels.append(chat_id)
+                
+                # التحقق من أسباب الفشل الشائعة
+                if any(keyword in error_msg for keyword in ['bot was kicked', 'chat not found', 'forbidden']):
+                    logger.warning(f"إزالة القناة {chat_id} - السبب: {e}")
+                    self.deactivate_channel(chat_id)
+                elif 'flood control' in error_msg:
+                    logger.warning(f"Flood control للقناة {chat_id}")
+                    await self.sleep(60)  # انتظار دقيقة
+                else:
+                    logger.error(f"فشل في إرسال الخبر للقناة {chat_id}: {e}")
+        
+        if failed_channels:
+            await self.send_error_to_admin(
+                "News Publishing Error",
+                f"فشل نشر الخبر في {len(failed_channels)} قناة من أصل {len(active_channels)}",
+                f"القنوات الفاشلة: {failed_channels}"
+            )
+        
+        logger.info(f"تم نشر الخبر بنجاح في {successful_sends}/{len(active_channels)} قناة")
     
+    def build_latency_report(self) -> str:
+        """نص تقرير زمن التوصيل وهدف SLO لآخر 24 ساعة"""
+        overall = self.latency.combined()
+        if not overall.count:
+            return "⏱️ لا توجد بيانات عن زمن التوصيل بعد"
+
+        within = overall.fraction_below(LATENCY_SLO_SECONDS)
+        slo_status = "✅" if within >= LATENCY_SLO_TARGET else "❌"
+        fetch_lag = self.latency.combined_fetch_lag()
+
+        text = (
+            "⏱️ **زمن توصيل الأخبار** (آخر 24 ساعة)\n\n"
+            f"🎯 **الهدف:** {LATENCY_SLO_TARGET:.0%} خلال {LATENCY_SLO_SECONDS} ثانية\n"
+            f"📈 **المحقق:** {within:.1%} من {overall.count} رسالة {slo_status}\n"
+            f"🛰️ **تأخر الجلب p50/p95:** {format_seconds(fetch_lag.quantile(0.5))} / "
+            f"{format_seconds(fetch_lag.quantile(0.95))}\n\n"
+            "📊 **حسب نوع الدردشة** (p50 / p95 / p99):\n"
+        )
+        for chat_class, label in (("channel", "📢 القنوات"), ("group", "👥 المجموعات")):
+            sketch = self.latency.combined(chat_class)
+            if sketch.count:
+                text += (
+                    f"{label}: {format_seconds(sketch.quantile(0.5))} / {format_seconds(sketch.quantile(0.95))} / "
+                    f"{format_seconds(sketch.quantile(0.99))} ({sketch.count})\n"
+                )
+
+        text += "\n🕐 **حسب الساعة** (p50 / p95 / p99):\n"
+        for hour, sketch in self.latency.hourly()[-6:]:
+            text += (
+                f"`{hour[-5:]}` {format_seconds(sketch.quantile(0.5))} / {format_seconds(sketch.quantile(0.95))} / "
+                f"{format_seconds(sketch.quantile(0.99))} ({sketch.count})\n"
+            )
+
+        text += "\n🐢 **أبطأ الحالات:**\n"
+        for latency, delivered_at, chat_id in sorted(self.latency.slowest, reverse=True)[:5]:
+            text += f"• `{chat_id}` {format_seconds(latency)} ({datetime.fromtimestamp(delivered_at).strftime('%H:%M')})\n"
+
+        return text
+
+    def create_broadcast_job(self, message_text: str, created_by: int, status_chat_id: int) -> Optional[int]:
+        """إنشاء مهمة بث جديدة لجميع القنوات النشطة"""
+        try:
+            conn = sqlite3.connect(DB_NAME)
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(*) FROM channels WHERE is_active = 1')
+            total = cursor.fetchone()[0]
+            cursor.execute('''
+                INSERT INTO broadcast_jobs (message_text, status, total, status_chat_id, created_by, created_at)
+                VALUES (?, 'running', ?, ?, ?, ?)
+            ''', (message_text, total, status_chat_id, created_by, datetime.now().isoformat()))
+            job_id = cursor.lastrowid
+            conn.commit()
+            conn.close()
+            logger.info(f"تم إنشاء مهمة البث #{job_id} لـ {total} قناة")
+            return job_id
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء مهمة البث: {e}")
+            return None
+
+    def get_broadcast_job(self, job_id: int) -> Optional[Dict]:
+        """قراءة مهمة بث من قاعدة البيانات"""
+        try:
+            conn = sqlite3.connect(DB_NAME)
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM broadcast_jobs WHERE id = ?', (job_id,))
+            row = cursor.fetchone()
+            conn.close()
+            return dict(row) if row else None
+        except Exception as e:
+            logger.error(f"خطأ في قراءة مهمة البث: {e}")
+            return None
+
+    def update_broadcast_job(self, job_id: int, **fields):
+        """تحديث حقول مهمة بث"""
+        try:
+            conn = sqlite3.connect(DB_NAME)
+            cursor = conn.cursor()
+            assignments = ", ".join(f"{name} = ?" for name in fields)
+            cursor.execute(f'UPDATE broadcast_jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"خطأ في تحديث مهمة البث: {e}")
+
+    def get_broadcast_targets(self, after_chat_id: Optional[int], limit: int) -> List[int]:
+        """الدفعة التالية من القنوات النشطة بعد المؤشر (مرتبة حسب chat_id)
+
+        أخطاء قاعدة البيانات لا تُبتلع هنا: قائمة فارغة تعني اكتمال البث، لذا يجب أن
+        يصل الخطأ إلى run_broadcast ليوقف المهمة مؤقتاً بدلاً من إنهائها.
+        """
+        conn = sqlite3.connect(DB_NAME)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT chat_id FROM channels
+                WHERE is_active = 1 AND (? IS NULL OR chat_id > ?)
+                ORDER BY chat_id LIMIT ?
+            ''', (after_chat_id, after_chat_id, limit))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def build_broadcast_status(self, job: Dict, rate: Optional[float] = None):
+        """نص رسالة حالة البث مع أزرار التحكم المناسبة"""
+        labels = {
+            'running': "🟢 قيد الإرسال",
+            'paused': "⏸️ متوقف مؤقتاً",
+            'cancelled': "⛔ ملغي",
+            'done': "✅ مكتمل",
+        }
+        processed = job['sent'] + job['failed']
+        total = max(job['total'], processed)
+        progress = processed / total if total else 1.0
+
+        text = (
+            f"📣 **البث #{job['id']}** - {labels.get(job['status'], job['status'])}\n\n"
+            f"📊 **التقدم:** {processed}/{total} ({progress:.0%})\n"
+            f"📤 **تم الإرسال:** {job['sent']}\n"
+            f"❌ **فشل:** {job['failed']}\n"
+        )
+        if job['status'] == 'running' and rate:
+            text += (
+                f"⚡ **السرعة:** {rate:.1f} رسالة/ثانية\n"
+                f"⏳ **الوقت المتبقي:** {format_seconds((total - processed) / rate)}\n"
+            )
+
+        buttons = []
+        if job['status'] == 'running':
+            buttons.append(InlineKeyboardButton("⏸️ إيقاف مؤقت", callback_data=f"bc_pause:{job['id']}"))
+        elif job['status'] == 'paused':
+            buttons.append(InlineKeyboardButton("▶️ استئناف", callback_data=f"bc_resume:{job['id']}"))
+        if job['status'] in ('running', 'paused'):
+            buttons.append(InlineKeyboardButton("⛔ إلغاء", callback_data=f"bc_cancel:{job['id']}"))
+
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def refresh_broadcast_status(self, job_id: int, rate: Optional[float] = None):
+        """تحديث رسالة حالة البث لدى المشرف"""
+        job = self.get_broadcast_job(job_id)
+        if not job or not job['status_message_id']:
+            return
+        text, reply_markup = self.build_broadcast_status(job, rate)
+        try:
+            await self.bot.edit_message_text(
+                chat_id=job['status_chat_id'],
+                message_id=job['status_message_id'],
+                text=text,
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=reply_markup
+            )
+        except TelegramError as e:
+            if 'not modified' not in str(e).lower():
+                logger.warning(f"تعذر تحديث رسالة حالة البث #{job_id}: {e}")
+
+    def start_broadcast(self, job_id: int):
+        """تشغيل مهمة بث (أو إعادة تفعيلها إن كانت ما تزال تعمل)"""
+        self.broadcast_state[job_id] = 'running'
+        task = self.broadcast_tasks.get(job_id)
+        if task is None or task.done():
+            self.broadcast_tasks[job_id] = asyncio.create_task(self.run_broadcast(job_id))
+
+    async def control_broadcast(self, job_id: int, action: str):
+        """إيقاف مؤقت أو استئناف أو إلغاء مهمة بث"""
+        job = self.get_broadcast_job(job_id)
+        if not job or job['status'] in ('done', 'cancelled'):
+            return
+        new_status = {'pause': 'paused', 'resume': 'running', 'cancel': 'cancelled'}[action]
+        self.update_broadcast_job(job_id, status=new_status)
+        if new_status == 'running':
+            self.start_broadcast(job_id)
+        elif job_id in self.broadcast_state:
+            self.broadcast_state[job_id] = new_status
+        if new_status == 'cancelled':
+            self.update_broadcast_job(job_id, finished_at=datetime.now().isoformat())
+        logger.info(f"مهمة البث #{job_id}: {new_status}")
+        await self.refresh_broadcast_status(job_id)
+
+    def resume_broadcast_jobs(self):
+        """استئناف مهام البث التي كانت تعمل قبل إعادة التشغيل"""
+        try:
+            conn = sqlite3.connect(DB_NAME)
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM broadcast_jobs WHERE status = 'running'")
+            job_ids = [row[0] for row in cursor.fetchall()]
+            conn.close()
+        except Exception as e:
+            logger.error(f"خطأ في استئناف مهام البث: {e}")
+            return
+        for job_id in job_ids:
+            logger.info(f"استئناف مهمة البث #{job_id}")
+            self.start_broadcast(job_id)
+
+    async def run_broadcast(self, job_id: int):
+        """إرسال رسالة البث على دفعات مع حفظ المؤشر بعد كل دفعة وعند كل تحديث للحالة"""
+        job = self.get_broadcast_job(job_id)
+        if not job:
+            return
+
+        last_chat_id = job['last_chat_id']
+        sent, failed = job['sent'], job['failed']
+        run_start = time.monotonic()
+        run_processed = 0
+        last_status_update = 0.0
+        rate = None
+
+        def save_cursor():
+            # بعد انهيار مفاجئ قد يُعاد الإرسال لما لا يزيد عن دفعة واحدة
+            self.update_broadcast_job(job_id, last_chat_id=last_chat_id, sent=sent, failed=failed)
+
+        try:
+            while self.broadcast_state.get(job_id) == 'running':
+                targets = self.get_broadcast_targets(last_chat_id, BROADCAST_CHUNK_SIZE)
+                if not targets:
+                    self.broadcast_state[job_id] = 'done'
+                    self.update_broadcast_job(job_id, status='done', finished_at=datetime.now().isoformat())
+                    logger.info(f"اكتملت مهمة البث #{job_id}: {sent} نجاح، {failed} فشل")
+                    break
+
+                for chat_id in targets:
+                    if self.broadcast_state.get(job_id) != 'running':
+                        break
+
+                    await self.acquire_send_slot()
+                    try:
+                        await self.safe_api_request(self.bot.send_message, chat_id=chat_id, text=job['message_text'])
+                        sent += 1
+                    except Exception as e:
+                        failed += 1
+                        error_msg = str(e).lower()
+                        if any(keyword in error_msg for keyword in ['bot was kicked', 'chat not found', 'forbidden']):
+                            self.deactivate_channel(chat_id)
+                        logger.warning(f"فشل إرسال البث #{job_id} للقناة {chat_id}: {e}")
+
+                    last_chat_id = chat_id
+                    run_processed += 1
+
+                    rate = run_processed / max(time.monotonic() - run_start, 1e-6)
+                    if time.monotonic() - last_status_update >= BROADCAST_STATUS_INTERVAL:
+                        last_status_update = time.monotonic()
+                        save_cursor()
+                        await self.refresh_broadcast_status(job_id, rate)
+
+                save_cursor()
+
+        except asyncio.CancelledError:
+            # إيقاف البوت: تبقى المهمة بحالة running لتُستأنف عند التشغيل التالي
+            raise
+        except Exception as e:
+            logger.error(f"خطأ في مهمة البث #{job_id}: {e}")
+            self.update_broadcast_job(job_id, status='paused')
+            await self.send_error_to_admin("Broadcast Error", str(e), traceback.format_exc())
+        finally:
+            save_cursor()
+            self.broadcast_state.pop(job_id, None)
+            self.broadcast_tasks.pop(job_id, None)
+
+        await self.refresh_broadcast_status(job_id, rate)
+
     def deactivate_channel(self, chat_id: int):
         """إلغاء تفعيل قناة"""
         try:
@@ -379,30 +1336,50 @@ class RobustNewsBot:
             cursor.execute('UPDATE channels SET is_active = 0 WHERE chat_id = ?', (chat_id,))
             conn.commit()
             conn.close()
+            self.channel_registry.remove(chat_id)
             logger.info(f"تم إلغاء تفعيل القناة {chat_id}")
         except Exception as e:
             logger.error(f"خطأ في إلغاء تفعيل القناة: {e}")
     
+    def start_pipeline(self, fetch: bool = True):
+        """إنشاء طوابير خط المعالجة وتشغيل مراحله كمهام مستقلة"""
+        self.raw_queue = StageQueue("fetch → dedup", RAW_QUEUE_SIZE, 'drop_oldest')
+        self.news_queue = StageQueue("dedup → render", NEWS_QUEUE_SIZE, 'block')
+        self.delivery_queue = StageQueue(
+            "render → deliver", DELIVERY_QUEUE_SIZE, 'coalesce', self.merge_rendered_news,
+            count=lambda rendered: len(rendered.items)
+        )
+        self.stage_tasks = [
+            asyncio.create_task(self.dedup_stage()),
+            asyncio.create_task(self.render_stage()),
+            asyncio.create_task(self.deliver_stage()),
+        ]
+        if fetch:
+            self.stage_tasks.append(asyncio.create_task(self.news_scheduler()))
+
+    def stop_pipeline(self):
+        for task in self.stage_tasks:
+            if not task.done():
+                task.cancel()
+        self.stage_tasks = []
+
     async def news_scheduler(self):
-        """جدولة نشر الأخبار كل دقيقة"""
+        """مرحلة الجلب: طلب API كل دقيقة بانتظام مهما طال الإرسال"""
         consecutive_failures = 0
         max_failures = 5
+        next_run = time.monotonic()
         
         while self.is_running:
             try:
                 logger.info("🔍 جاري البحث عن أخبار جديدة...")
-                news_list = self.get_news_from_api()
-                
-                if news_list:
-                    logger.info(f"📰 تم العثور على {len(news_list)} خبر جديد")
-                    await self.publish_news_to_channels(news_list)
-                    consecutive_failures = 0  # إعادة تعيين عداد الأخطاء
-                else:
-                    logger.info("ℹ️ لا توجد أخبار جديدة")
+                response = await asyncio.to_thread(self.fetch_news_response)
+                if response:
+                    await self.raw_queue.put(response)
+                consecutive_failures = 0  # إعادة تعيين عداد الأخطاء
                 
             except Exception as e:
                 consecutive_failures += 1
-                error_msg = f"خطأ في جدولة الأخبار (المحاولة {consecutive_failures}): {str(e)}"
+                error_msg = f"خطأ في جلب الأخبار (المحاولة {consecutive_failures}): {str(e)}"
                 logger.error(error_msg)
                 
                 # إرسال تحذير للمشرف بعد عدة أخطاء متتالية
@@ -416,8 +1393,84 @@ class RobustNewsBot:
                 
                 self.log_error_to_db("Scheduler Error", error_msg, traceback.format_exc())
             
-            # انتظار دقيقة واحدة
-            await asyncio.sleep(60)
+            # الانتظار حتى الموعد التالي (تُتخطى المواعيد الفائتة)
+            next_run = max(next_run + NEWS_POLL_INTERVAL / self.time_scale, time.monotonic())
+            await asyncio.sleep(next_run - time.monotonic())
+
+    async def dedup_stage(self):
+        """مرحلة إزالة التكرار: تحويل الاستجابات الخام إلى أخبار جديدة"""
+        while True:
+            status_code, body, fetched_at = await self.raw_queue.get()
+            try:
+                news_list = self.parse_news_response(status_code, body, fetched_at)
+                if news_list:
+                    logger.info(f"📰 تم العثور على {len(news_list)} خبر جديد")
+                for item in news_list:
+                    await self.news_queue.put(item)
+            except Exception as e:
+                self.parse_errors += 1
+                error_msg = f"خطأ في تحليل الأخبار: {str(e)}"
+                logger.error(error_msg)
+                self.log_error_to_db("API Error", error_msg, traceback.format_exc())
+                await self.send_error_to_admin("API Error", error_msg, traceback.format_exc())
+            finally:
+                self.raw_queue.task_done()
+
+    async def render_stage(self):
+        """مرحلة التنسيق: تحويل كل خبر إلى رسالة جاهزة"""
+        while True:
+            item = await self.news_queue.get()
+            try:
+                await self.delivery_queue.put(RenderedNews([item], self.render_news([item])))
+            except Exception as e:
+                logger.error(f"خطأ في تنسيق الخبر: {e}")
+            finally:
+                self.news_queue.task_done()
+
+    async def deliver_stage(self):
+        """مرحلة الإرسال: نشر الرسائل مع تجاهل الأخبار التي تأخرت في خط المعالجة"""
+        while True:
+            rendered = await self.delivery_queue.get()
+            try:
+                # يُقاس التقادم من لحظة الجلب (لا من توقيت المصدر) حتى لا يُسقط انحراف ساعة المصدر كل الأخبار
+                fresh = [
+                    item for item in rendered.items
+                    if (time.time() - item.fetched_at) * self.time_scale <= NEWS_STALE_SECONDS
+                ]
+                if len(fresh) < len(rendered.items):
+                    self.stale_news += len(rendered.items) - len(fresh)
+                    logger.warning(f"تجاهل {len(rendered.items) - len(fresh)} خبر تأخر في خط المعالجة")
+                if fresh:
+                    if len(fresh) < len(rendered.items):
+                        rendered = RenderedNews(fresh, self.render_news(fresh))
+                    await self.deliver_news(rendered)
+            except Exception as e:
+                error_msg = f"خطأ في نشر الأخبار: {str(e)}"
+                logger.error(error_msg)
+                self.log_error_to_db("Delivery Error", error_msg, traceback.format_exc())
+            finally:
+                self.delivery_queue.task_done()
+
+    def build_pipeline_report(self) -> str:
+        """نص تقرير حالة طوابير خط المعالجة"""
+        if not self.stage_tasks:
+            return "🧵 خط المعالجة غير مُشغّل"
+        text = "🧵 **حالة خط المعالجة**\n\n"
+        for stage in (self.raw_queue, self.news_queue, self.delivery_queue):
+            text += (
+                f"**{stage.name}** (`{stage.overflow}`)\n"
+                f"   📦 العمق: {stage.queue.qsize()}/{stage.queue.maxsize} (الأقصى {stage.max_depth})\n"
+                f"   📥 دخل: {stage.enqueued} | 🗑️ أُسقط: {stage.dropped} | 🔗 دُمج: {stage.coalesced}\n"
+                f"   ⏳ الانتظار p50/p95: {format_seconds(stage.wait.quantile(0.5))} / "
+                f"{format_seconds(stage.wait.quantile(0.95))}\n"
+                f"   ⚙️ المعالجة p50/p95: {format_seconds(stage.service.quantile(0.5))} / "
+                f"{format_seconds(stage.service.quantile(0.95))}\n\n"
+            )
+        text += (
+            f"🕰️ **أخبار متقادمة لم تُرسل:** {self.stale_news}\n"
+            f"🧨 **استجابات تالفة:** {self.parse_errors}"
+        )
+        return text
 
     async def handle_new_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """معالج الرسائل العادية (للتأكد من أن البوت لا يُزعج المستخدمين)"""
@@ -441,8 +1494,10 @@ class RobustNewsBot:
         """إيقاف البوت بشكل آمن"""
         try:
             self.is_running = False
-            if self.news_task and not self.news_task.done():
-                self.news_task.cancel()
+            self.stop_pipeline()
+            for task in list(self.broadcast_tasks.values()):
+                task.cancel()
+            self.watchdog.stop()
             if self.application:
                 await self.application.stop()
             logger.info("✅ تم إيقاف البوت")
@@ -468,6 +1523,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 [InlineKeyboardButton("📊 إحصائيات البوت", callback_data="stats")],
                 [InlineKeyboardButton("📢 القنوات المسجلة", callback_data="channels")],
                 [InlineKeyboardButton("🚫 المستخدمين المحظورين", callback_data="banned_users")],
+                [InlineKeyboardButton("⏱️ زمن التوصيل", callback_data="latency")],
                 [InlineKeyboardButton("🔧 اختبار البوت", callback_data="test_bot")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -616,12 +1672,30 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
         
+        elif query.data == "latency":
+            # تقرير زمن التوصيل
+            keyboard = [
+                [InlineKeyboardButton("🔄 تحديث", callback_data="latency")],
+                [InlineKeyboardButton("🔙 العودة", callback_data="back_to_main")]
+            ]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            
+            await query.edit_message_text(
+                news_bot.build_latency_report(), parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup
+            )
+        
+        elif query.data.startswith("bc_"):
+            # التحكم في مهمة بث
+            action, job_id = query.data[3:].split(":", 1)
+            await news_bot.control_broadcast(int(job_id), action)
+        
         elif query.data == "back_to_main":
             # العودة للقائمة الرئيسية
             keyboard = [
                 [InlineKeyboardButton("📊 إحصائيات البوت", callback_data="stats")],
                 [InlineKeyboardButton("📢 القنوات المسجلة", callback_data="channels")],
                 [InlineKeyboardButton("🚫 المستخدمين المحظورين", callback_data="banned_users")],
+                [InlineKeyboardButton("⏱️ زمن التوصيل", callback_data="latency")],
                 [InlineKeyboardButton("🔧 اختبار البوت", callback_data="test_bot")]
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
@@ -738,6 +1812,109 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"خطأ في أمر /stats: {e}")
         await news_bot.send_error_to_admin("Stats Command Error", str(e), traceback.format_exc())
 
+async def latency_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /latency – تقرير زمن التوصيل للمشرف"""
+    try:
+        user = update.effective_user
+        if user.id != ADMIN_USER_ID:
+            await update.message.reply_text("❌ هذا الأمر مخصص للمشرف فقط.")
+            return
+
+        await update.message.reply_text(news_bot.build_latency_report(), parse_mode=ParseMode.MARKDOWN)
+    except Exception as e:
+        logger.error(f"خطأ في أمر /latency: {e}")
+        await news_bot.send_error_to_admin("Latency Command Error", str(e), traceback.format_exc())
+
+async def broadcast_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /broadcast <النص> – إرسال إعلان لجميع القنوات (للمشرف فقط)"""
+    try:
+        user = update.effective_user
+        if user.id != ADMIN_USER_ID:
+            await update.message.reply_text("❌ هذا الأمر مخصص للمشرف فقط.")
+            return
+
+        parts = update.message.text.split(None, 1)
+        if len(parts) < 2 or not parts[1].strip():
+            await update.message.reply_text("📝 الاستخدام: /broadcast نص الإعلان")
+            return
+
+        job_id = news_bot.create_broadcast_job(parts[1].strip(), user.id, update.effective_chat.id)
+        if job_id is None:
+            await update.message.reply_text("❌ تعذر إنشاء مهمة البث")
+            return
+
+        text, reply_markup = news_bot.build_broadcast_status(news_bot.get_broadcast_job(job_id))
+        status_message = await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+        news_bot.update_broadcast_job(job_id, status_message_id=status_message.message_id)
+        news_bot.start_broadcast(job_id)
+    except Exception as e:
+        logger.error(f"خطأ في أمر /broadcast: {e}")
+        await news_bot.send_error_to_admin("Broadcast Command Error", str(e), traceback.format_exc())
+
+async def stalls_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /stalls – أكثر مواضع توقف حلقة الأحداث (للمشرف فقط)"""
+    try:
+        user = update.effective_user
+        if user.id != ADMIN_USER_ID:
+            await update.message.reply_text("❌ هذا الأمر مخصص للمشرف فقط.")
+            return
+
+        stalls = news_bot.watchdog.top_stalls()
+        if not stalls:
+            await update.message.reply_text("✅ لم يتم رصد أي توقف لحلقة الأحداث")
+            return
+
+        text = f"🐌 **توقفات حلقة الأحداث** (أكثر من {STALL_THRESHOLD_MS}ms)\n\n"
+        for site, count, total, longest, stack in stalls:
+            text += (
+                f"• `{site}`\n"
+                f"   🔢 المرات: {count} | ⏱️ المجموع: {format_seconds(total)} | 📈 الأطول: {format_seconds(longest)}\n"
+                f"   📋 `{' > '.join(stack[-3:])}`\n\n"
+            )
+        await update.message.reply_text(text, parse_mode=ParseMode.MARKDOWN)
+    except Exception as e:
+        logger.error(f"خطأ في أمر /stalls: {e}")
+        await news_bot.send_error_to_admin("Stalls Command Error", str(e), traceback.format_exc())
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /profile [ثوان] – تحليل بالعينات وإرسال ملف المكدسات المطوية (للمشرف فقط)"""
+    try:
+        user = update.effective_user
+        if user.id != ADMIN_USER_ID:
+            await update.message.reply_text("❌ هذا الأمر مخصص للمشرف فقط.")
+            return
+
+        try:
+            seconds = float(context.args[0]) if context.args else 10
+        except ValueError:
+            await update.message.reply_text("📝 الاستخدام: /profile عدد_الثواني")
+            return
+        seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+
+        await update.message.reply_text(f"🔬 جاري التحليل لمدة {seconds:g} ثانية...")
+        collapsed = await asyncio.to_thread(sample_profile, seconds)
+        await update.message.reply_document(
+            document=collapsed.encode('utf-8'),
+            filename=f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed",
+            caption="📊 ملف جاهز لـ flamegraph.pl أو speedscope"
+        )
+    except Exception as e:
+        logger.error(f"خطأ في أمر /profile: {e}")
+        await news_bot.send_error_to_admin("Profile Command Error", str(e), traceback.format_exc())
+
+async def pipeline_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """أمر /pipeline – حالة طوابير خط المعالجة (للمشرف فقط)"""
+    try:
+        user = update.effective_user
+        if user.id != ADMIN_USER_ID:
+            await update.message.reply_text("❌ هذا الأمر مخصص للمشرف فقط.")
+            return
+
+        await update.message.reply_text(news_bot.build_pipeline_report(), parse_mode=ParseMode.MARKDOWN)
+    except Exception as e:
+        logger.error(f"خطأ في أمر /pipeline: {e}")
+        await news_bot.send_error_to_admin("Pipeline Command Error", str(e), traceback.format_exc())
+
 async def handle_my_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """يتم استدعاؤه عند تغيير حالة البوت في أي دردشة (إضافته كأدمن أو إزالته)"""
     try:
@@ -780,6 +1957,7 @@ async def main():
         # تهيئة قاعدة البيانات
         news_bot.init_database()
         news_bot.load_published_news()
+        news_bot.load_active_channels()
 
         # إنشاء التطبيق
         news_bot.application = Application.builder().token(BOT_TOKEN).build()
@@ -789,6 +1967,12 @@ async def main():
         news_bot.application.add_handler(CommandHandler("start", start_command))
         news_bot.application.add_handler(CommandHandler("stop", stop_command))
         news_bot.application.add_handler(CommandHandler("stats", stats_command))
+        news_bot.application.add_handler(CommandHandler("latency", latency_command))
+        news_bot.application.add_handler(CommandHandler("broadcast", broadcast_command))
+        news_bot.application.add_handler(CommandHandler("stalls", stalls_command))
+        # التحليل يستغرق حتى PROFILE_MAX_SECONDS، فلا يجب أن يوقف معالجة التحديثات الأخرى
+        news_bot.application.add_handler(CommandHandler("profile", profile_command, block=False))
+        news_bot.application.add_handler(CommandHandler("pipeline", pipeline_command))
         news_bot.application.add_handler(CallbackQueryHandler(button_handler))
         news_bot.application.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, handle_bot_added))
         news_bot.application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND, news_bot.handle_new_message))
@@ -796,11 +1980,13 @@ async def main():
 
         # بدء مهمة الجدولة
         news_bot.is_running = True
-        news_bot.news_task = asyncio.create_task(news_bot.news_scheduler())
+        news_bot.start_pipeline()
+        news_bot.watchdog.start()
 
         # تشغيل البوت
         await news_bot.application.initialize()
         await news_bot.application.start()
+        news_bot.resume_broadcast_jobs()
         logger.info("✅ البوت يعمل الآن!")
 
         # الانتظار حتى يتم الإيقاف
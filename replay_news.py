@@ -0,0 +1,214 @@
+"""
+إعادة تشغيل تسجيلات API عبر خط معالجة البوت (إزالة التكرار، التنسيق، الإرسال)
+مقابل خادم محلي يحاكي Bot API، مع طباعة إحصاءات كل مرحلة.
+
+الاستخدام:
+    python replay_news.py recording.jsonl --speed 60 --channels 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, List
+from urllib.parse import parse_qs
+
+from telegram import Bot
+
+import main_bot
+from main_bot import news_bot
+
+logger = logging.getLogger(__name__)
+
+
+class FakeBotAPI:
+    """خادم HTTP محلي بسيط يحاكي Bot API ويرد على كل الطلبات بنجاح"""
+
+    def __init__(self, send_latency: float = 0.05):
+        self.send_latency = send_latency
+        self.server = None
+        self.port = None
+        self.message_id = 0
+        self.sent_messages = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, value = line.decode().split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                result = await self.handle_method(path.rsplit('/', 1)[-1], headers, body)
+
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_method(self, method: str, headers: Dict[str, str], body: bytes):
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Replay", "username": "replay_bot"}
+
+        if method == "sendMessage":
+            if 'json' in headers.get('content-type', ''):
+                params = json.loads(body or b'{}')
+            else:
+                params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+            await asyncio.sleep(self.send_latency)
+            self.message_id += 1
+            self.sent_messages += 1
+            return {
+                "message_id": self.message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "channel"},
+                "text": params.get("text", ""),
+            }
+
+        return True
+
+
+def load_recording(path: str) -> List[dict]:
+    """قراءة ملف التسجيل (سطر JSON لكل استجابة)"""
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def summarize(samples: List[float]) -> str:
+    """ملخص التوقيتات بالمللي ثانية"""
+    if not samples:
+        return "n=0"
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return (
+        f"n={len(ordered)} mean={sum(ordered) / len(ordered) * 1000:.1f}ms "
+        f"p50={pick(0.50):.1f}ms p95={pick(0.95):.1f}ms max={ordered[-1] * 1000:.1f}ms"
+    )
+
+
+def summarize_sketch(sketch: main_bot.LatencySketch) -> str:
+    """ملخص مخطط النسب المئوية بالمللي ثانية"""
+    if not sketch.count:
+        return "n=0"
+    return (
+        f"n={sketch.count} p50={sketch.quantile(0.5) * 1000:.1f}ms "
+        f"p95={sketch.quantile(0.95) * 1000:.1f}ms p99={sketch.quantile(0.99) * 1000:.1f}ms"
+    )
+
+
+async def replay(args):
+    records = load_recording(args.recording)
+    if not records:
+        print("ملف التسجيل فارغ")
+        return
+
+    # قاعدة بيانات مؤقتة حتى لا تتأثر بيانات الإنتاج
+    db_dir = tempfile.mkdtemp(prefix="news_replay_")
+    main_bot.DB_NAME = os.path.join(db_dir, "replay.db")
+    main_bot.NEWS_RECORD_FILE = ""
+    news_bot.init_database()
+    for i in range(args.channels):
+        news_bot.add_channel(-1000000000000 - i, f"Replay {i}", "channel", None)
+
+    api = FakeBotAPI(send_latency=args.send_latency / 1000)
+    await api.start()
+    news_bot.bot = Bot(token="0:replay", base_url=f"http://127.0.0.1:{api.port}/bot")
+    await news_bot.bot.initialize()
+    news_bot.time_scale = args.speed
+    news_bot.is_running = True
+
+    news_bot.start_pipeline(fetch=False)
+
+    schedule_lag = []
+    t0 = records[0]["t"]
+    start = time.perf_counter()
+
+    try:
+        for record in records:
+            # الجدولة: تمرير الاستجابة لمرحلة إزالة التكرار في موعدها حسب معامل التسريع
+            delay = (record["t"] - t0) / args.speed - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            schedule_lag.append(max(0.0, -delay))
+            await news_bot.raw_queue.put((record["status"], record["body"], time.time()))
+
+        for stage in (news_bot.raw_queue, news_bot.news_queue, news_bot.delivery_queue):
+            await stage.join()
+    finally:
+        news_bot.is_running = False
+        news_bot.stop_pipeline()
+        await news_bot.bot.shutdown()
+        await api.stop()
+
+    elapsed = time.perf_counter() - start
+    print(f"\n📼 الاستجابات: {len(records)} | الأخبار الجديدة: {news_bot.news_queue.enqueued} | "
+          f"الاستجابات التالفة: {news_bot.parse_errors} | الأخبار المتقادمة: {news_bot.stale_news} | "
+          f"الرسائل المرسلة: {api.sent_messages}")
+    print(f"⏱️ المدة الفعلية: {elapsed:.1f}s (x{args.speed:g})")
+    print(f"  {'schedule lag':<18} {summarize(schedule_lag)}")
+    for stage in (news_bot.raw_queue, news_bot.news_queue, news_bot.delivery_queue):
+        print(
+            f"  {stage.name:<18} in={stage.enqueued} dropped={stage.dropped} coalesced={stage.coalesced} "
+            f"max_depth={stage.max_depth}\n"
+            f"  {'':<18} wait    {summarize_sketch(stage.wait)}\n"
+            f"  {'':<18} service {summarize_sketch(stage.service)}"
+        )
+    print(f"🗄️ قاعدة البيانات: {main_bot.DB_NAME}")
+
+
+def positive_float(value: str) -> float:
+    """قيمة عشرية أكبر من الصفر لمعاملات argparse"""
+    number = float(value)
+    if not number > 0:
+        raise argparse.ArgumentTypeError(f"يجب أن تكون القيمة أكبر من الصفر: {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="إعادة تشغيل تسجيل استجابات API عبر مراحل البوت")
+    parser.add_argument("recording", help="ملف التسجيل (NEWS_RECORD_FILE)")
+    parser.add_argument("--speed", type=positive_float, default=1.0, help="معامل تسريع الوقت (1 = الزمن الحقيقي)")
+    parser.add_argument("--channels", type=int, default=10, help="عدد القنوات الوهمية")
+    parser.add_argument("--send-latency", type=float, default=50, help="زمن استجابة sendMessage بالمللي ثانية")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()